@@ -1,20 +1,57 @@
+import logging
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Tuple
-import cv2
 import numpy as np
 from PySide6 import QtCore
-from PySide6.QtCore import Qt, QPointF, QRect
-from PySide6.QtGui import QPainter, QPen, QBrush, QColor, QPainterPath, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QPointF, QRect, Signal
+from PySide6.QtGui import QPainter, QPen, QBrush, QColor, QKeySequence, QShortcut, QImage, QOpenGLContext
 from PySide6.QtWidgets import (
     QWidget, QMenu
 )
 
 from projections import Projection
-from utils import cv_to_qimage
+from utils import dumps_json
+from warp_worker import WarpWorker
 
+log = logging.getLogger(__name__)
 
-class Canvas(QWidget):
-    """Render widget with draggable 4-point quad per media; live homography warp."""
+# Composite on the GPU: in live mode each source is warped by a shader (gl_warp); otherwise the
+# CPU composite is drawn through QPainter's OpenGL paint engine. create_canvas() falls back to
+# the raster canvas when no GL context can be created; PROJECTION_NO_GL=1 forces raster.
+try:
+    from PySide6.QtOpenGLWidgets import QOpenGLWidget
+except ImportError:
+    QOpenGLWidget = None
+USE_GL = QOpenGLWidget is not None and not os.environ.get("PROJECTION_NO_GL")
+if USE_GL:
+    from gl_warp import GLWarpRenderer
+
+
+def _gl_context_available() -> bool:
+    """Whether an OpenGL context can actually be created here (needs a QGuiApplication)."""
+    return QOpenGLContext().create()
+
+
+def create_canvas(parent=None) -> "CanvasBase":
+    """GLCanvas when OpenGL works on this machine, otherwise the raster Canvas."""
+    if USE_GL and _gl_context_available():
+        return GLCanvas(parent)
+    if USE_GL:
+        log.warning("No OpenGL context available, using the raster canvas")
+    return Canvas(parent)
+
+
+class CanvasBase:
+    """Render widget with draggable 4-point quad per media; live homography warp.
+
+    Mixed into a QWidget (Canvas) or a QOpenGLWidget (GLCanvas); use create_canvas().
+    """
+
+    _GL = False  # True on the QOpenGLWidget variant
+
+    _mediaLoaded = Signal(str, object)  # (path, Future[Projection]) from the loader pool
+    _projectorClosed = Signal(object)  # ProjectorOutput whose window was closed from its side
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -23,19 +60,48 @@ class Canvas(QWidget):
         # NEW: list of projections (media + quad)
         self.projections: List[Projection] = []
         self.selected_idx: int = -1  # which projection we are editing
-
-        self.timer = QtCore.QTimer(self)
-        self.timer.setInterval(16)  # ~60 fps
-        self.timer.timeout.connect(self.update)
-        self.timer.start()
+        # All quads in one (N, 4, 2) array; each Projection.quad is a view of its row
+        self._quads = np.empty((0, 4, 2), dtype=np.float32)
+
+        # Warp + composite run on a worker thread; paintGL only blits the latest finished frame
+        self._latest_qimg = QImage()
+        # GPU path (OpenGL canvas, live mode): the worker hands over sources, paintGL warps them
+        self._gl_warp: "GLWarpRenderer" = None
+        self._gpu_items: list = []  # [(projection, quad, frame, seq_no)]
+        self._projector = None  # ProjectorOutput while projecting; forces the CPU composite
+        self._warp_thread = QtCore.QThread(self)
+        self._worker = WarpWorker()
+        self._worker.moveToThread(self._warp_thread)
+        self._warp_thread.started.connect(self._worker.start)
+        self._worker.frameReady.connect(self._on_frame_ready, Qt.QueuedConnection)
+        self._worker.sourcesReady.connect(self._on_sources_ready, Qt.QueuedConnection)
+        self._warp_thread.start()
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            # SIGINT -> QApplication.quit() skips closeEvent; still stop the thread
+            app.aboutToQuit.connect(self.shutdown)
 
         self.live_warp = True
         self.show_mesh = True
         self.drag_idx = -1
+        # Mouse moves only mark the drag dirty; this ~60 Hz one-shot publishes it, so a
+        # 1000 Hz mouse doesn't push 1000 scene snapshots/repaints a second
+        self._drag_dirty = False
+        self._drag_timer = QtCore.QTimer(self)
+        self._drag_timer.setSingleShot(True)
+        self._drag_timer.setInterval(16)
+        self._drag_timer.timeout.connect(self._flush_drag)
         self.handle_radius = 10
         self.bg_color = QColor(0, 0, 0)
 
         self._cached_frame: np.ndarray = None
+        self._preset_bytes: bytes = None  # serialized preset, dropped on any scene change
+
+        # Media files are opened/decoded on a pool; results come back through _mediaLoaded
+        self._loader = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="load")
+        self._loads_pending = 0  # submitted to _loader, not yet back in _on_media_loaded
+        self._mediaLoaded.connect(self._on_media_loaded, Qt.QueuedConnection)
+        self._projectorClosed.connect(self._on_projector_closed, Qt.QueuedConnection)
 
         # Delete key shortcuts
         self._sc_delete = QShortcut(QKeySequence(Qt.Key_Delete), self)
@@ -47,27 +113,29 @@ class Canvas(QWidget):
 
     # --- HIT TESTS / HELPERS ---
 
-    def _path_for_quad(self, quad: List[QPointF]) -> QPainterPath:
-        path = QPainterPath()
-        path.moveTo(quad[0])
-        for i in range(1, 4):
-            path.lineTo(quad[i])
-        path.closeSubpath()
-        return path
-
     def _projection_under(self, pos: QPointF) -> int:
         """Return topmost projection index whose quad contains pos, else -1."""
         # Check from top (last drawn) to bottom so clicks prefer the topmost one
         for rev_idx, proj in enumerate(reversed(self.projections)):
             idx = len(self.projections) - 1 - rev_idx
-            if self._path_for_quad(proj.target_quad).contains(pos):
+            if proj.polygon().containsPoint(pos, Qt.OddEvenFill):
                 return idx
         return -1
 
+    def _sync_quads(self):
+        """Restack the shared quad array after projections were added, removed or reordered."""
+        if self.projections:
+            self._quads = np.stack([p.quad for p in self.projections])
+        else:
+            self._quads = np.empty((0, 4, 2), dtype=np.float32)
+        for i, p in enumerate(self.projections):
+            p.quad = self._quads[i]
+
     def _bring_to_top(self, idx: int):
         if 0 <= idx < len(self.projections):
             self.projections.append(self.projections.pop(idx))
             self.selected_idx = len(self.projections) - 1
+            self._sync_quads()
 
     # --- DELETION ---
 
@@ -75,22 +143,21 @@ class Canvas(QWidget):
         """Delete a projection by index and keep selection sane."""
         if not (0 <= idx < len(self.projections)):
             return
-        # Optional: release video capture
+        # Optional: release video capture (the worker may still be reading it; close() locks)
         try:
-            vs = self.projections[idx].media
-            if getattr(vs, "cap", None) is not None:
-                vs.cap.release()
+            self.projections[idx].close()
         except Exception:
             pass
 
         del self.projections[idx]
+        self._sync_quads()
 
         if not self.projections:
             self.selected_idx = -1
         else:
             # If we deleted the last one, move selection to new last
             self.selected_idx = min(idx, len(self.projections) - 1)
-        self.update()
+        self.scene_changed()
 
     def delete_selected_projection(self):
         """Delete the currently selected projection (for Delete/Backspace)."""
@@ -98,52 +165,82 @@ class Canvas(QWidget):
             self.delete_projection(self.selected_idx)
 
 
-    def _default_quad(self) -> List[QPointF]:
-        """Quad inset from widget edges."""
+    def _default_quad(self) -> np.ndarray:
+        """Quad inset from widget edges, as a (4, 2) float32 array."""
         w = max(1, self.width())
         h = max(1, self.height())
         margin = min(w, h) * 0.1
-        return [
-            QPointF(margin, margin),
-            QPointF(w - margin, margin),
-            QPointF(w - margin, h - margin),
-            QPointF(margin, h - margin),
-        ]
+        return np.array(
+            [[margin, margin], [w - margin, margin], [w - margin, h - margin], [margin, h - margin]],
+            dtype=np.float32,
+        )
 
     def reset_quad(self):
         """Reset currently selected quad; if none, reset all."""
         if self.selected_idx >= 0 and self.selected_idx < len(self.projections):
-            self.projections[self.selected_idx].target_quad = self._default_quad()
+            self.projections[self.selected_idx].quad[:] = self._default_quad()
+            self.projections[self.selected_idx].invalidate()
         else:
             for p in self.projections:
-                p.target_quad = self._default_quad()
-        self.update()
+                p.quad[:] = self._default_quad()
+                p.invalidate()
+        self.scene_changed()
 
     # --- MULTI-MEDIA API ---
 
-    def add_media(self, paths: List[str]):
-        """Add one or more media files. Each becomes its own projection."""
-        if not paths:
-            return
+    def _staggered_quads(self, n: int) -> List[np.ndarray]:
         # If canvas size unknown yet, just use default hardcoded quad; it will still be editable
         base_quad = self._default_quad()
 
-        # Stagger quads a bit so multiple are visible initially
+        # Stagger quads a bit so multiple are visible initially; files still loading count too,
+        # so back-to-back batches don't land on top of each other
         offset_step = 40
-        start_offset = len(self.projections) * offset_step
+        start_offset = (len(self.projections) + self._loads_pending) * offset_step
+        return [base_quad + (start_offset + i*10) for i in range(n)]
 
-        for i, path in enumerate(paths):
-            quad = [QPointF(p.x() + start_offset + i*10, p.y() + start_offset + i*10) for p in base_quad]
+    def _add_projection(self, proj: Projection):
+        self.projections.append(proj)
+        self._sync_quads()
+        if self.selected_idx == -1:
+            self.selected_idx = 0
+        self.scene_changed()
+
+    def add_media(self, paths: List[str]):
+        """Add one or more media files (loaded on the calling thread). Each becomes its own projection."""
+        for path, quad in zip(paths, self._staggered_quads(len(paths))):
             try:
                 proj = Projection(path, quad)
-                self.projections.append(proj)
             except Exception as e:
-                print(f"[WARN] Failed to load {path}: {e}")
+                log.warning("Failed to load %s: %s", path, e)
+                continue
+            self._add_projection(proj)
 
-        if self.projections and self.selected_idx == -1:
-            self.selected_idx = 0
+    def add_media_async(self, paths: List[str]):
+        """Like add_media, but files load in parallel off the GUI thread.
 
-        self.update()
+        Each projection is added (on the GUI thread) as soon as its file is ready.
+        """
+        if self._loader is None:
+            return
+        for path, quad in zip(paths, self._staggered_quads(len(paths))):
+            self._loads_pending += 1
+            future = self._loader.submit(Projection, path, quad)
+            # Runs on the pool thread; the signal hops back to the GUI thread
+            future.add_done_callback(lambda f, path=path: self._mediaLoaded.emit(path, f))
+
+    def _on_media_loaded(self, path: str, future: Future):
+        self._loads_pending -= 1
+        if future.cancelled():  # dropped by shutdown()
+            return
+        try:
+            proj = future.result()
+        except Exception as e:
+            log.warning("Failed to load %s: %s", path, e)
+            return
+        if self._loader is None:
+            proj.close()  # finished after shutdown()
+            return
+        self._add_projection(proj)
 
     def select_next(self, direction: int = +1):
         if not self.projections:
@@ -154,8 +251,95 @@ class Canvas(QWidget):
 
     # --- RENDERING ---
 
-    # canvas.py
+    def scene_changed(self):
+        """Publish projections/quads/flags to the warp worker and repaint the overlay."""
+        self._preset_bytes = None
+        self._worker.set_scene(
+            self.projections, self.live_warp, self.width(), self.height(),
+            dragged=self.projections[self.drag_idx] if 0 <= self.drag_idx < len(self.projections) else None,
+            gpu=self._gl_warp is not None and self.live_warp and self._projector is None,
+        )
+        self.update()
+
+    def mark_dirty(self):
+        """Flags like live_warp changed: re-render with the new settings."""
+        self.scene_changed()
+
+    def set_projector_output(self, output):
+        """Mirror the composite to a ProjectorOutput (None to detach).
+
+        Closing the projector window (Esc) detaches it too, re-enabling the GPU warp.
+        """
+        if self._projector is not None:
+            self._projector.on_closed = None
+        self._projector = output
+        if output is not None:
+            output.on_closed = lambda: self._projectorClosed.emit(output)
+        self._worker.set_output(output)
+        self.scene_changed()
+
+    def _on_projector_closed(self, output):
+        if output is self._projector:
+            self.set_projector_output(None)
+
+    def _on_frame_ready(self, qimg: QImage):
+        # Holding the new frame releases the previous one, so the worker may reuse its buffer
+        self._latest_qimg = qimg
+        self._gpu_items = []
+        self._worker.ack()
+        self.update()
+
+    def _on_sources_ready(self, items: list):
+        self._gpu_items = items
+        self._latest_qimg = QImage()
+        self._worker.ack()
+        self.update()
+
+    def initializeGL(self):
+        renderer = GLWarpRenderer()
+        if renderer.initialize():
+            self._gl_warp = renderer
+            self.context().aboutToBeDestroyed.connect(self._cleanup_gl)
+            self.scene_changed()  # switch the worker to GPU mode
+
+    def _cleanup_gl(self):
+        self.makeCurrent()
+        self._gl_warp.cleanup()
+        self._gl_warp = None
+        self.doneCurrent()
+
+    def shutdown(self):
+        """Stop the warp thread, media loader and video decoders (call before the window goes away)."""
+        if self._loader is not None:
+            self._loader.shutdown(wait=False, cancel_futures=True)
+            self._loader = None
+        if self._warp_thread.isRunning():
+            # The worker's timer lives on its thread, so it has to be stopped there
+            QtCore.QMetaObject.invokeMethod(self._worker, "stop", Qt.BlockingQueuedConnection)
+            self._warp_thread.quit()
+            self._warp_thread.wait()
+        if self._projector is not None:
+            self._projector.stop()
+        for proj in self.projections:
+            proj.close()  # sets the decoder's stop event and joins it
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.scene_changed()
+
     def paintEvent(self, event):
+        if self._GL:
+            # QOpenGLWidget binds its framebuffer here, then calls paintGL()
+            super().paintEvent(event)
+        else:
+            self.paintGL()
+
+    def paintGL(self):
+        gpu = self._gl_warp is not None and bool(self._gpu_items) and bool(self.projections)
+        if gpu:
+            # Native GL first (clears to bg_color); QPainter then draws the overlay on top
+            self._gl_warp.draw(self._gpu_items, self.width(), self.height(), self.devicePixelRatioF(), self.bg_color)
+
         painter = QPainter(self)
         # ok = painter.begin(self)  
 
@@ -163,7 +347,8 @@ class Canvas(QWidget):
         #     return
 
         try:
-            painter.fillRect(self.rect(), self.bg_color)
+            if not gpu:
+                painter.fillRect(self.rect(), self.bg_color)
             if not self.projections:
                 painter.setPen(QPen(QColor(220, 220, 220)))
                 painter.drawText(
@@ -174,52 +359,9 @@ class Canvas(QWidget):
                 self.draw_overlay(painter)
                 return
 
-            w, h = self.width(), self.height()
-
-            for idx, proj in enumerate(self.projections):
-                frame = proj.media.get_frame()
-                if frame is None:
-                    continue
-
-                # source and destination quads
-                src_w, src_h = proj.media.get_source_size()
-                src_quad = np.array(
-                    [[0, 0], [src_w - 1, 0], [src_w - 1, src_h - 1], [0, src_h - 1]],
-                    dtype=np.float32,
-                )
-                dst_quad = np.array([[p.x(), p.y()] for p in proj.target_quad], dtype=np.float32)
-
-                # Build clip path for this quad (ALWAYS clip!)
-                path = QPainterPath()
-                path.moveTo(dst_quad[0][0], dst_quad[0][1])
-                for i in range(1, 4):
-                    path.lineTo(dst_quad[i][0], dst_quad[i][1])
-                path.closeSubpath()
-
-                painter.save()
-                painter.setClipPath(path)
-
-                if self.live_warp:
-                    # Warp into full-canvas buffer, then draw under clip
-                    H = cv2.getPerspectiveTransform(src_quad, dst_quad)
-                    warped = cv2.warpPerspective(frame, H, (w, h))
-                    qimg = cv_to_qimage(warped)
-                    painter.drawImage(0, 0, qimg)
-                else:
-                    # Non-live mode: draw the raw frame scaled to the quad’s bounding box, still clipped to quad
-                    qimg = cv_to_qimage(frame)
-                    # simple bounding-rect fit (keeps aspect)
-                    minx, miny = np.min(dst_quad, axis=0).astype(int)
-                    maxx, maxy = np.max(dst_quad, axis=0).astype(int)
-                    bw = max(1, maxx - minx)
-                    bh = max(1, maxy - miny)
-                    scaled = qimg.scaled(bw, bh, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    # center inside the bounding rect
-                    ox = minx + (bw - scaled.width()) // 2
-                    oy = miny + (bh - scaled.height()) // 2
-                    painter.drawImage(ox, oy, scaled)
-
-                painter.restore()
+            # Finished composite from the warp worker (quads already cut by their masks)
+            if not self._latest_qimg.isNull():
+                painter.drawImage(0, 0, self._latest_qimg)
 
             # Draw overlays LAST, so handles/mesh are always visible
             self.draw_overlay(painter)
@@ -238,14 +380,12 @@ class Canvas(QWidget):
             pen = QPen(color, 2, Qt.SolidLine)
             painter.setPen(pen)
 
-            quad = proj.target_quad
-            for i in range(4):
-                a = quad[i]
-                b = quad[(i + 1) % 4]
-                painter.drawLine(a, b)
+            poly = proj.polygon()
+            painter.setBrush(Qt.NoBrush)
+            painter.drawPolygon(poly)
 
             # Handles
-            for i, p in enumerate(quad):
+            for p in poly:
                 painter.setBrush(QBrush(QColor(255, 255, 255)))
                 painter.setPen(QPen(Qt.black, 1))
                 r = self.handle_radius
@@ -263,10 +403,11 @@ class Canvas(QWidget):
 
     def _hit_handle(self, pos: QPointF):
         """Return (proj_idx, handle_idx) of the first handle under cursor, else (-1,-1)."""
-        for pidx, proj in enumerate(self.projections):
-            for i, pt in enumerate(proj.target_quad):
-                if (pos - pt).manhattanLength() <= self.handle_radius * 1.5:
-                    return pidx, i
+        p = np.array([pos.x(), pos.y()], dtype=np.float32)
+        d = np.abs(self._quads - p).sum(axis=2)  # (N, 4) manhattan distances
+        hits = np.argwhere(d <= self.handle_radius * 1.5)
+        if hits.size:
+            return int(hits[0, 0]), int(hits[0, 1])
         return -1, -1
 
     # canvas.py
@@ -281,14 +422,14 @@ class Canvas(QWidget):
                 self.drag_idx = hidx
                 # raise selected to top so it renders last
                 self._bring_to_top(self.selected_idx)
-                self.update()
+                self.scene_changed()
                 return
 
             # If not a handle, see if we clicked inside a quad to select it
             pidx = self._projection_under(pos)
             if pidx != -1:
                 self._bring_to_top(pidx)
-                self.update()
+                self.scene_changed()
                 return
 
         elif event.button() == Qt.RightButton:
@@ -296,7 +437,7 @@ class Canvas(QWidget):
             pidx = self._projection_under(pos)
             if pidx != -1:
                 self._bring_to_top(pidx)
-                self.update()
+                self.scene_changed()
 
                 menu = QMenu(self)
                 act_del = menu.addAction("Delete Media")
@@ -314,14 +455,25 @@ class Canvas(QWidget):
             pos = event.position()
             x = max(0, min(self.width(), pos.x()))
             y = max(0, min(self.height(), pos.y()))
-            self.projections[self.selected_idx].target_quad[self.drag_idx] = QPointF(x, y)
-            self.update()
+            self._quads[self.selected_idx, self.drag_idx] = (x, y)
+            self.projections[self.selected_idx].invalidate()
+            self._drag_dirty = True
+            if not self._drag_timer.isActive():
+                self._drag_timer.start()
             return
         super().mouseMoveEvent(event)
 
+    def _flush_drag(self):
+        if self._drag_dirty:
+            self._drag_dirty = False
+            self.scene_changed()
+
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.drag_idx >= 0:
             self.drag_idx = -1
+            self._drag_timer.stop()
+            self._drag_dirty = False
+            self.scene_changed()  # final position, re-rendered at full (bilinear) quality
         super().mouseReleaseEvent(event)
 
     # --- PRESET I/O ---
@@ -334,39 +486,66 @@ class Canvas(QWidget):
             "projections": [
                 {
                     "media_path": p.path,
-                    "target_quad": [[pt.x(), pt.y()] for pt in p.target_quad],
+                    "target_quad": np.round(p.quad.astype(np.float64), 3).tolist(),
                 }
                 for p in self.projections
             ],
         }
 
+    def preset_bytes(self) -> bytes:
+        """serialize() as JSON bytes, cached until the scene changes."""
+        if self._preset_bytes is None:
+            self._preset_bytes = dumps_json(self.serialize())
+        return self._preset_bytes
+
     def deserialize(self, data: dict):
         self.live_warp = bool(data.get("live_warp", True))
         self.show_mesh = bool(data.get("show_mesh", True))
 
+        # Old projections are released only after the new ones are built, so media that both
+        # presets use keeps its shared source instead of being closed and reopened
+        old = self.projections
         self.projections = []
-        projections = data.get("projections")
-
-        # Back-compat: support old single-media schema if present
-        if not projections:
-            tq = data.get("target_quad")
-            media_path = data.get("media_path")
-            if media_path:
-                quad = [QPointF(float(x), float(y)) for x, y in tq] if tq else self._default_quad()
-                try:
-                    self.projections.append(Projection(media_path, quad))
-                except Exception as e:
-                    print(f"[WARN] failed to load legacy preset media: {e}")
-        else:
-            for item in projections:
-                media_path = item.get("media_path")
-                tq = item.get("target_quad") or []
-                quad = [QPointF(float(x), float(y)) for x, y in tq] if len(tq) == 4 else self._default_quad()
-                if media_path and os.path.exists(media_path):
+        try:
+            projections = data.get("projections")
+
+            # Back-compat: support old single-media schema if present
+            if not projections:
+                media_path = data.get("media_path")
+                if media_path:
+                    try:
+                        tq = data.get("target_quad")
+                        quad = np.array(tq, dtype=np.float32) if tq else self._default_quad()
+                        self.projections.append(Projection(media_path, quad))
+                    except Exception as e:
+                        log.warning("Failed to load legacy preset media: %s", e)
+            else:
+                for item in projections:
+                    media_path = item.get("media_path")
+                    if not (media_path and os.path.exists(media_path)):
+                        continue
                     try:
+                        tq = item.get("target_quad") or []
+                        quad = np.array(tq, dtype=np.float32) if len(tq) == 4 else self._default_quad()
                         self.projections.append(Projection(media_path, quad))
                     except Exception as e:
-                        print(f"[WARN] failed to load {media_path}: {e}")
+                        log.warning("Failed to load %s: %s", media_path, e)
+        finally:
+            # Even if the preset was malformed, drop the old scene and publish what was built
+            for proj in old:
+                proj.close()
+            self._sync_quads()
+            self.selected_idx = 0 if self.projections else -1
+            self.scene_changed()
 
-        self.selected_idx = 0 if self.projections else -1
-        self.update()
+
+class Canvas(CanvasBase, QWidget):
+    """Raster canvas: QPainter draws the worker's CPU composite."""
+
+
+if USE_GL:
+
+    class GLCanvas(CanvasBase, QOpenGLWidget):
+        """OpenGL canvas: live warps run in the gl_warp shader."""
+
+        _GL = True
@@ -0,0 +1,157 @@
+"""GPU warp for the OpenGL canvas: each projection's frame is a texture mapped onto its quad.
+
+The fragment shader does the projective divide per pixel, so the CPU warp, mask and full-canvas
+upload are skipped entirely; a texture is re-uploaded only when its video produced a new frame.
+Everything here runs with the canvas's GL context current (initializeGL / paintGL).
+"""
+import logging
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QColor, QOpenGLContext, QVector3D
+from PySide6.QtOpenGL import QOpenGLPixelTransferOptions, QOpenGLShader, QOpenGLShaderProgram, QOpenGLTexture
+
+from projections import Projection
+from video_source import corner_points
+
+log = logging.getLogger(__name__)
+
+GL_COLOR_BUFFER_BIT = 0x00004000
+GL_TRIANGLE_FAN = 0x0006
+
+# GLSL 1.30 for gl_VertexID: the quad's corners come from a uniform, so no vertex buffer is needed
+VERTEX_SHADER = """
+#version 130
+uniform vec2 u_quad[4];  // quad corners, canvas pixels
+uniform vec2 u_view;     // canvas size, canvas pixels
+void main() {
+    vec2 p = u_quad[gl_VertexID];
+    gl_Position = vec4(p.x / u_view.x * 2.0 - 1.0, 1.0 - p.y / u_view.y * 2.0, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 130
+uniform sampler2D u_tex;
+uniform vec3 u_m0;          // rows of the canvas pixel -> texture coordinate homography
+uniform vec3 u_m1;
+uniform vec3 u_m2;
+uniform float u_dpr;        // device pixels per canvas pixel
+uniform float u_fb_height;  // framebuffer height, device pixels
+void main() {
+    // Canvas pixel index under this fragment, top-left origin like the CPU warp
+    vec3 p = vec3(vec2(gl_FragCoord.x - 0.5, u_fb_height - gl_FragCoord.y - 0.5) / u_dpr, 1.0);
+    vec3 t = vec3(dot(u_m0, p), dot(u_m1, p), dot(u_m2, p));
+    gl_FragColor = vec4(texture(u_tex, t.xy / t.z).rgb, 1.0);
+}
+"""
+
+UNIFORMS = ("u_quad", "u_view", "u_tex", "u_m0", "u_m1", "u_m2", "u_dpr", "u_fb_height")
+
+
+def texture_matrix(quad: np.ndarray, src_w: int, src_h: int) -> np.ndarray:
+    """Canvas pixel -> normalized texture coordinate for a src_w x src_h source shown on quad.
+
+    Source pixel centres sit at integer coordinates (as in Projection.homography), so pixel k
+    maps to texel centre (k + 0.5) / size. Independent of the uploaded (possibly downscaled)
+    texture's size.
+    """
+    H = cv2.getPerspectiveTransform(corner_points(src_w, src_h), np.asarray(quad, dtype=np.float32))
+    S = np.array([[1 / src_w, 0, 0.5 / src_w], [0, 1 / src_h, 0.5 / src_h], [0, 0, 1]], dtype=np.float64)
+    return S @ np.linalg.inv(H)
+
+
+class GLWarpRenderer:
+    """Owns the warp shader and one texture per projection."""
+
+    def __init__(self):
+        self._program: QOpenGLShaderProgram = None
+        self._loc: Dict[str, int] = {}
+        self._textures: Dict[Projection, Tuple[QOpenGLTexture, int]] = {}  # proj -> (texture, seq_no)
+        self._matrices: Dict[Projection, Tuple[bytes, np.ndarray]] = {}  # proj -> (quad key, matrix)
+        self._upload = QOpenGLPixelTransferOptions()
+        self._upload.setAlignment(1)  # BGR rows aren't 4-byte aligned in general
+
+    def initialize(self) -> bool:
+        """Compile the shader; False (with a warning) if this GL can't run it."""
+        program = QOpenGLShaderProgram()
+        ok = (
+            program.addShaderFromSourceCode(QOpenGLShader.Vertex, VERTEX_SHADER)
+            and program.addShaderFromSourceCode(QOpenGLShader.Fragment, FRAGMENT_SHADER)
+            and program.link()
+        )
+        if not ok:
+            log.warning("GPU warp unavailable, compositing on the CPU: %s", program.log())
+            return False
+        self._program = program
+        self._loc = {name: program.uniformLocation(name) for name in UNIFORMS}
+        return True
+
+    def _texture(self, proj: Projection, frame: np.ndarray, seq_no: int) -> QOpenGLTexture:
+        """proj's texture, re-uploaded only when a new frame arrived (or its size changed)."""
+        h, w = frame.shape[:2]
+        tex, last_seq = self._textures.get(proj, (None, None))
+        if tex is not None and (tex.width(), tex.height()) != (w, h):
+            tex.destroy()
+            tex = None
+        if tex is None:
+            tex = QOpenGLTexture(QOpenGLTexture.Target2D)
+            tex.setAutoMipMapGenerationEnabled(False)
+            tex.setMipLevels(1)
+            tex.setSize(w, h)
+            tex.setFormat(QOpenGLTexture.RGB8_UNorm)
+            tex.setMinMagFilters(QOpenGLTexture.Linear, QOpenGLTexture.Linear)
+            tex.setWrapMode(QOpenGLTexture.ClampToEdge)
+            tex.allocateStorage(QOpenGLTexture.BGR, QOpenGLTexture.UInt8)
+            last_seq = None
+        if seq_no != last_seq:
+            frame = np.ascontiguousarray(frame)
+            tex.setData(QOpenGLTexture.BGR, QOpenGLTexture.UInt8, frame.ctypes.data, self._upload)
+            self._textures[proj] = (tex, seq_no)
+        return tex
+
+    def _matrix(self, proj: Projection, quad: np.ndarray) -> np.ndarray:
+        key = quad.tobytes()
+        cached = self._matrices.get(proj)
+        if cached is None or cached[0] != key:
+            cached = self._matrices[proj] = (key, texture_matrix(quad, *proj.media.get_source_size()))
+        return cached[1]
+
+    def draw(self, items: List[Tuple[Projection, np.ndarray, np.ndarray, int]], w: int, h: int, dpr: float, bg: QColor):
+        """Clear to bg and draw each (projection, quad, frame, seq_no) bottom to top."""
+        f = QOpenGLContext.currentContext().functions()
+        f.glClearColor(bg.redF(), bg.greenF(), bg.blueF(), 1.0)
+        f.glClear(GL_COLOR_BUFFER_BIT)
+
+        loc = self._loc
+        self._program.bind()
+        self._program.setUniformValue(loc["u_view"], float(w), float(h))
+        self._program.setUniformValue1i(loc["u_tex"], 0)
+        self._program.setUniformValue1f(loc["u_dpr"], float(dpr))
+        self._program.setUniformValue1f(loc["u_fb_height"], float(round(h * dpr)))
+        for proj, quad, frame, seq_no in items:
+            tex = self._texture(proj, frame, seq_no)
+            M = self._matrix(proj, quad)
+            tex.bind(0)
+            self._program.setUniformValue(loc["u_m0"], QVector3D(*M[0]))
+            self._program.setUniformValue(loc["u_m1"], QVector3D(*M[1]))
+            self._program.setUniformValue(loc["u_m2"], QVector3D(*M[2]))
+            self._program.setUniformValueArray(loc["u_quad"], quad.ravel().tolist(), 4, 2)
+            f.glDrawArrays(GL_TRIANGLE_FAN, 0, 4)
+            tex.release(0)
+        self._program.release()
+
+        # Drop textures of projections that left the scene (deleted or culled)
+        shown = {item[0] for item in items}
+        for proj in [p for p in self._textures if p not in shown]:
+            self._textures.pop(proj)[0].destroy()
+            self._matrices.pop(proj, None)
+
+    def cleanup(self):
+        """Free GL resources (context must be current)."""
+        for tex, _ in self._textures.values():
+            tex.destroy()
+        self._textures.clear()
+        self._matrices.clear()
+        self._program = None
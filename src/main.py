@@ -1,17 +1,19 @@
 
-import json
+import logging
 import math
 import os
 import sys
 from pathlib import Path
 from typing import List, Tuple
-from canvas import Canvas
+from canvas import create_canvas
+from projector_output import HAVE_PYGAME, ProjectorOutput
+from utils import loads_json
 import signal
 
 import cv2
 import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
-from PySide6.QtCore import Qt, QPointF, QRect, QTimer
+from PySide6.QtCore import Qt, QPointF, QRect
 from PySide6.QtGui import QAction, QImage, QPainter, QPen, QBrush, QColor
 from PySide6.QtWidgets import (
     QApplication,
@@ -29,10 +31,12 @@ from PySide6.QtWidgets import (
 
 from PySide6.QtGui import QAction, QImage, QPainter, QPen, QBrush, QColor, QKeySequence
 from PySide6.QtWidgets import (  # ensure these are imported
-    QApplication, QMainWindow, QFileDialog, QMessageBox, QCheckBox, QPushButton, QToolBar
+    QApplication, QMainWindow, QFileDialog, QMessageBox, QCheckBox, QPushButton
 )
 from PySide6.QtGui import QShortcut
 
+log = logging.getLogger(__name__)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -40,14 +44,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Projection Mapper — MVP")
         self.resize(1200, 800)
 
-        self.canvas = Canvas(self)
+        self.canvas = create_canvas(self)
         self.setCentralWidget(self.canvas)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.tick)
-        self.timer.start(16)
+        # Fullscreen projection goes to a separate pygame window when available
+        self.projector = ProjectorOutput() if HAVE_PYGAME else None
 
         # Controls
         toolbar = self.addToolBar("Main")
+        self._toolbar = toolbar  # the only toolbar; kept so toggling doesn't search for it
 
         # NEW: Add Media(s)
         act_add = QAction("Add Media", self)
@@ -113,14 +117,10 @@ class MainWindow(QMainWindow):
         # Status tip
         self.statusBar().showMessage("Load media to begin (File → Open Media). Drag corner handles to align.")
 
-    def tick(self):
-        # update any state variables here
-        self.canvas.update()  # schedules paintEvent()
-
     def closeEvent(self, event):
         # Stop background activity before closing
-        self.timer.stop()
         if hasattr(self, "canvas"):
+            self.canvas.shutdown()
             self.canvas._closing = True  # optional flag for paint guard
         super().closeEvent(event)
 
@@ -132,8 +132,8 @@ class MainWindow(QMainWindow):
             "Media Files (*.png *.jpg *.jpeg *.bmp *.mp4 *.mov *.avi *.mkv);;All Files (*)",
         )
         if paths:
-            self.canvas.add_media(paths)
-            self.statusBar().showMessage(f"Added {len(paths)} media file(s)")
+            self.canvas.add_media_async(paths)
+            self.statusBar().showMessage(f"Adding {len(paths)} media file(s)")
 
 
     def save_preset(self):
@@ -142,9 +142,8 @@ class MainWindow(QMainWindow):
         )
         if path:
             try:
-                data = self.canvas.serialize()
-                with open(path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
+                with open(path, "wb") as f:
+                    f.write(self.canvas.preset_bytes())
                 self.statusBar().showMessage(f"Saved preset: {path}")
             except Exception as e:
                 QMessageBox.critical(self, "Save Error", str(e))
@@ -155,8 +154,8 @@ class MainWindow(QMainWindow):
         )
         if path:
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                with open(path, "rb") as f:
+                    data = loads_json(f.read())
                 self.canvas.deserialize(data)
                 self.statusBar().showMessage(f"Loaded preset: {path}")
             except Exception as e:
@@ -174,17 +173,26 @@ class MainWindow(QMainWindow):
 
     # --- replace these handlers ---
     def toggle_live(self, checked: bool):
-        print(f"[DEBUG] toggle_live checked={checked}")
+        log.debug("toggle_live checked=%s", checked)
         self.canvas.live_warp = checked
-        self.canvas.update()
+        self.canvas.mark_dirty()
 
     def toggle_mesh(self, checked: bool):
-        print(f"[DEBUG] toggle_mesh checked={checked}")
+        log.debug("toggle_mesh checked=%s", checked)
         self.canvas.show_mesh = checked
-        self.canvas.update()
+        self.canvas.mark_dirty()
 
 
     def toggle_fullscreen(self):
+        if self.projector is not None:
+            # Operator UI stays in Qt; Esc in the projector window also closes it
+            if self.projector.running:
+                self.projector.stop()
+                self.canvas.set_projector_output(None)
+            else:
+                self.projector.start()
+                self.canvas.set_projector_output(self.projector)
+            return
         if self.isFullScreen():
             self.showNormal()
         else:
@@ -206,8 +214,7 @@ class MainWindow(QMainWindow):
 
     def toggle_toolbar(self, checked: bool):
         # True => hide, False => show
-        for tb in self.findChildren(QToolBar):
-            tb.setVisible(not checked)
+        self._toolbar.setVisible(not checked)
         # keep UX hint accurate
         msg = "Toolbar hidden (press H to toggle back)" if checked else "Toolbar visible"
         self.statusBar().showMessage(msg)
@@ -217,6 +224,9 @@ def sigint_handler(signum, frame):
     QApplication.quit()
 
 def main():
+    # Quiet by default; PROJECTION_LOG=debug (or info, ...) opts in
+    level = getattr(logging, os.environ.get("PROJECTION_LOG", "warning").upper(), logging.WARNING)
+    logging.basicConfig(level=level, format="[%(levelname)s] %(name)s: %(message)s")
     app = QApplication(sys.argv)
     
    
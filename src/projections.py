@@ -5,20 +5,331 @@ import os
 import sys
 
 from pathlib import Path
-from typing import List
-from video_source import VideoSource
+from typing import List, Tuple
+from video_source import VideoSource, corner_points
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPolygonF
+
+import cv2
+import numpy as np
+
+# OpenCV Transparent API: with a working OpenCL runtime, UMat warps run on the GPU
+USE_OPENCL = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
 
 class Projection:
     """One mapped media on its own quad."""
-    def __init__(self, path: str, quad: List[QPointF] | None = None):
-        self.media = VideoSource()
-        self.media.load(path)
+    def __init__(self, path: str, quad: np.ndarray | None = None):
+        # Target quad as a (4, 2) float32 array; QPointF only at the UI edge (see quad_qpoints).
+        # Filled first: a malformed quad raises before a media reference is taken
+        self.quad = np.empty((4, 2), dtype=np.float32)
+        self.quad[:] = quad if quad is not None else [[200, 150], [800, 150], [800, 550], [200, 550]]
+        self.media = VideoSource.get_or_create(path)  # shared with other projections of path
         self.path = path
-        self.target_quad: List[QPointF] = quad or [
-            QPointF(200, 150),
-            QPointF(800, 150),
-            QPointF(800, 550),
-            QPointF(200, 550),
-        ]
\ No newline at end of file
+
+        # Homography cache, keyed on (src_w, src_h, quad)
+        self._last_H: np.ndarray = None
+        self._last_key: tuple = None
+        # Quad as a QPolygonF for hit tests / overlay; rebuilt lazily after edits
+        self._polygon: QPolygonF = None
+        self._qpoints: List[QPointF] = None  # same corners as QPointF, rebuilt lazily too
+
+        # Remap LUTs, rebuilt only when the quad / source / canvas size changes
+        self._map_x: np.ndarray = None
+        self._map_y: np.ndarray = None
+        self._quad_hash: int = None
+        self._inv_map: np.ndarray = None  # canvas -> (downscaled) source pixel matrix
+        self._roi: Tuple[int, int, int, int] = None  # (x0, y0, x1, y1) in canvas pixels
+        self._warp_buf: np.ndarray = None  # reused remap output, reallocated only on ROI resize
+        self._mask: np.ndarray = None  # ROI-sized quad coverage (0/255), rebuilt with the LUTs
+        self._mask_bool: np.ndarray = None  # same, as an (h, w, 1) bool for np.copyto(where=)
+
+        # Source downscaling: never feed the warp more than ~2x the pixels the quad can show
+        self.max_src_dim: int | None = None  # optional hard cap on the source's longest side
+        self._scaled_src: np.ndarray = None  # frame the cached downscale was made from
+        self._scaled_frame: np.ndarray = None
+        self._scaled_size: Tuple[int, int] = None
+        self._prepared_quad: bytes = None  # quad prepare_source() last sized the source for
+
+        # T-API upload of the current source frame, refreshed only when a new frame arrives
+        self._umat: cv2.UMat = None
+        self._umat_src: np.ndarray = None
+        try:
+            self.prepare_source(self.quad)
+        except Exception:
+            self.media.close(owner=self)
+            raise
+
+    def close(self):
+        """Release this projection's reference to its (possibly shared) media."""
+        self.media.close(owner=self)
+
+    def invalidate(self):
+        """Drop cached geometry after the quad was edited."""
+        self._last_key = None
+        self._quad_hash = None
+        self._polygon = None
+        self._qpoints = None
+
+    def homography(self, src_w: int, src_h: int, quad: np.ndarray | None = None) -> np.ndarray:
+        """Source-pixel -> canvas homography, recomputed only when the quad or source size changes.
+
+        quad defaults to self.quad; the warp worker passes its own snapshot.
+        """
+        quad = self.quad if quad is None else quad
+        # Raw float32 bytes: exact, and far cheaper to build than a rounded tuple of floats
+        key = (src_w, src_h, np.ascontiguousarray(quad, dtype=np.float32).tobytes())
+        if key != self._last_key:
+            # Corners precomputed by the source at load time; rebuilt only for some other size
+            src = self.media.src_pts
+            if src is None or src[2, 0] != src_w - 1 or src[2, 1] != src_h - 1:
+                src = corner_points(src_w, src_h)
+            self._last_H = cv2.getPerspectiveTransform(src, quad)
+            self._last_key = key
+        return self._last_H
+
+    @property
+    def quad_qpoints(self) -> List[QPointF]:
+        """Quad corners as QPointF for painter calls, cached until the next invalidate()."""
+        if self._qpoints is None:
+            self._qpoints = [QPointF(float(x), float(y)) for x, y in self.quad.tolist()]
+        return self._qpoints
+
+    def polygon(self) -> QPolygonF:
+        """Quad as a QPolygonF, cached until the next invalidate()."""
+        if self._polygon is None:
+            self._polygon = QPolygonF(self.quad_qpoints)
+        return self._polygon
+
+    def _source_size(self, src_w: int, src_h: int, dst_quad: np.ndarray) -> Tuple[int, int] | None:
+        """Size a src_w x src_h source should be shrunk to for dst_quad, or None to keep it as is.
+
+        The target is at most 2x the quad's extent (and max_src_dim), rounded up to 1/16 scale
+        steps so small drags don't change it every frame.
+        """
+        _, _, bw, bh = cv2.boundingRect(dst_quad.astype(np.int32))
+        limit = 2 * max(bw, bh, 1)
+        if self.max_src_dim:
+            limit = min(limit, self.max_src_dim)
+        if max(src_w, src_h) <= limit:
+            return None
+        scale = math.ceil(limit / max(src_w, src_h) * 16) / 16
+        if scale >= 1.0:
+            return None
+        return max(1, round(src_w * scale)), max(1, round(src_h * scale))
+
+    def prepare_source(self, dst_quad: np.ndarray):
+        """Shrink the source for dst_quad ahead of the warp.
+
+        Videos hand the target size to their decoder thread, which resizes each frame as it is
+        decoded; stills are resized once here and cached.
+        """
+        self._prepared_quad = dst_quad.tobytes()
+        if self.media.is_video:
+            self.media.set_output_size(self._source_size(*self.media.get_source_size(), dst_quad), owner=self)
+        else:
+            self._downscale(self.media.get_frame()[0], dst_quad)
+
+    def source_for(self, frame: np.ndarray, dst_quad: np.ndarray) -> np.ndarray:
+        """frame as warp() would sample it for dst_quad, for the GPU path that skips warp().
+
+        Re-targets the decoder when dst_quad differs from the last quad it was prepared for.
+        """
+        key = dst_quad.tobytes()
+        if key != self._prepared_quad:
+            self.prepare_source(dst_quad)
+        return self._downscale(frame, dst_quad)
+
+    def _downscale(self, frame: np.ndarray, dst_quad: np.ndarray) -> np.ndarray:
+        """Return frame shrunk (INTER_AREA) for dst_quad, cached per frame and size.
+
+        Frames the decoder already resized come back untouched.
+        """
+        size = self._source_size(*self.media.get_source_size(), dst_quad)
+        if size is None or frame.shape[1] <= size[0]:
+            return frame
+        if frame is not self._scaled_src or size != self._scaled_size:
+            self._scaled_frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            self._scaled_src = frame
+            self._scaled_size = size
+        return self._scaled_frame
+
+    @staticmethod
+    def _quad_mask(dst_quad: np.ndarray, x0: int, y0: int, bw: int, bh: int) -> np.ndarray:
+        """Rasterize dst_quad into a (bh, bw) 0/255 mask whose origin is canvas pixel (x0, y0)."""
+        mask = np.zeros((bh, bw), dtype=np.uint8)
+        # 4 fractional bits so the mask edge follows the sub-pixel quad
+        pts = np.round((dst_quad - (x0, y0)) * 16).astype(np.int32)
+        cv2.fillPoly(mask, [pts], 255, shift=4)
+        return mask
+
+    @staticmethod
+    def _quad_roi(dst_quad: np.ndarray, w: int, h: int) -> Tuple[int, int, int, int]:
+        """Bounding box of dst_quad clipped to the canvas; empty if x0 >= x1 or y0 >= y1."""
+        bx, by, bw, bh = cv2.boundingRect(dst_quad.astype(np.int32))
+        x0, y0 = max(0, bx), max(0, by)
+        # +1 covers the fractional part dropped by the int cast (clip path is anti-aliased)
+        x1, y1 = min(w, bx + bw + 1), min(h, by + bh + 1)
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _inverse_map(H: np.ndarray, sx: float = 1.0, sy: float = 1.0) -> np.ndarray:
+        """Canvas pixel -> source pixel matrix (H^-1).
+
+        (sx, sy) rescale the result when the frame was downscaled from H's source size,
+        pixel-centre aligned like cv2.resize.
+        """
+        A = np.array([[sx, 0, 0.5 * sx - 0.5], [0, sy, 0.5 * sy - 0.5], [0, 0, 1]], dtype=np.float64)
+        return A @ np.linalg.inv(H)
+
+    def _build_maps(self, M: np.ndarray, roi: Tuple[int, int, int, int]):
+        """Evaluate the inverse map M over the ROI grid and pack it into fixed-point remap tables."""
+        x0, y0, x1, y1 = roi
+        M = M.astype(np.float32)
+        xs = np.arange(x0, x1, dtype=np.float32)[None, :]
+        ys = np.arange(y0, y1, dtype=np.float32)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            den = M[2, 0] * xs + M[2, 1] * ys + M[2, 2]
+            map_x = (M[0, 0] * xs + M[0, 1] * ys + M[0, 2]) / den
+            map_y = (M[1, 0] * xs + M[1, 1] * ys + M[1, 2]) / den
+        # Points on/behind the horizon line have no source pixel; push them outside
+        map_x = np.nan_to_num(map_x, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        map_y = np.nan_to_num(map_y, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        # CV_16SC2 + CV_16UC1 is the fast (SIMD) path inside cv2.remap
+        self._map_x, self._map_y = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def _warp_direct(self, frame: np.ndarray, dst: np.ndarray, x0: int, y0: int, interpolation: int):
+        """One-off warp for a quad that just moved, without materializing a coordinate grid.
+
+        cv2.warpPerspective with WARP_INVERSE_MAP: hand-written Numba kernels measured slower
+        than it for every quad size that matters, bilinear and nearest alike.
+        """
+        T = np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+        bh, bw = dst.shape[:2]
+        cv2.warpPerspective(
+            frame, self._inv_map @ T, (bw, bh), dst=dst,
+            flags=interpolation | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT,
+        )
+
+    def _warp_opencl(self, frame: np.ndarray, dst: np.ndarray, x0: int, y0: int, interpolation: int):
+        """Warp on the OpenCL device; only the ROI-sized result is downloaded."""
+        if frame is not self._umat_src:
+            self._umat = cv2.UMat(frame)
+            self._umat_src = frame
+        T = np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+        bh, bw = dst.shape[:2]
+        out = cv2.warpPerspective(
+            self._umat, self._inv_map @ T, (bw, bh),
+            flags=interpolation | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT,
+        )
+        np.copyto(dst, out.get())
+
+    def warp(self, frame: np.ndarray, dst_quad: np.ndarray, w: int, h: int, interpolation: int = cv2.INTER_LINEAR):
+        """Warp frame onto dst_quad, reusing the LUTs while the quad is static.
+
+        Only the quad's bounding box is rendered. While the quad keeps moving (dragging) each
+        frame is warped directly; the remap LUTs are built once it has held still for a frame.
+        interpolation applies to those direct warps; the LUT path is always bilinear.
+        Returns (warped, x0, y0) where (x0, y0) is the canvas position of the ROI, or None if
+        the quad lies entirely off-canvas. `warped` is a buffer owned by the projection and is
+        overwritten by the next call.
+        """
+        native_w, native_h = self.media.get_source_size()
+        frame = self._downscale(frame, dst_quad)
+        src_h, src_w = frame.shape[:2]
+        quad_hash = hash((src_w, src_h, tuple(dst_quad.flatten()), w, h))
+        moved = quad_hash != self._quad_hash
+        if moved:
+            self.prepare_source(dst_quad)
+            self._roi = self._quad_roi(dst_quad, w, h)
+            x0, y0, x1, y1 = self._roi
+            self._map_x = self._map_y = None
+            if x0 < x1 and y0 < y1:
+                H = self.homography(native_w, native_h, dst_quad)
+                self._inv_map = self._inverse_map(H, src_w / native_w, src_h / native_h)
+                self._mask = self._quad_mask(dst_quad, x0, y0, x1 - x0, y1 - y0)
+                self._mask_bool = self._mask.astype(bool)[..., None]
+            else:
+                self._inv_map = self._mask = self._mask_bool = None
+            self._quad_hash = quad_hash
+        if self._inv_map is None:
+            return None
+        x0, y0, x1, y1 = self._roi
+        shape = (y1 - y0, x1 - x0) + frame.shape[2:]
+        if self._warp_buf is None or self._warp_buf.shape != shape:
+            self._warp_buf = np.empty(shape, dtype=np.uint8)
+        if USE_OPENCL:
+            # GPU warps are cheap enough per frame that the CPU LUTs aren't worth building
+            self._warp_opencl(frame, self._warp_buf, x0, y0, interpolation)
+            return self._warp_buf, x0, y0
+        if moved:
+            self._warp_direct(frame, self._warp_buf, x0, y0, interpolation)
+            return self._warp_buf, x0, y0
+        if self._map_x is None:
+            self._build_maps(self._inv_map, self._roi)
+        # The fixed-point LUTs carry bilinear weights; sampling them with INTER_NEAREST shifts the
+        # image, so a quad that holds still is always drawn bilinear
+        cv2.remap(
+            frame, self._map_x, self._map_y, cv2.INTER_LINEAR,
+            dst=self._warp_buf, borderMode=cv2.BORDER_CONSTANT,
+        )
+        return self._warp_buf, x0, y0
+
+    def _fit(self, frame: np.ndarray, quad: np.ndarray, w: int, h: int):
+        """Non-live preview: frame scaled (aspect kept) and centred in the quad's bounding box.
+
+        Returns (img, x0, y0) clipped to the (w, h) canvas, or None if nothing is visible.
+        """
+        minx, miny = np.min(quad, axis=0).astype(int)
+        maxx, maxy = np.max(quad, axis=0).astype(int)
+        bw = max(1, maxx - minx)
+        bh = max(1, maxy - miny)
+        src_h, src_w = frame.shape[:2]
+        s = min(bw / src_w, bh / src_h)
+        sw, sh = max(1, round(src_w * s)), max(1, round(src_h * s))
+        interp = cv2.INTER_AREA if s < 1.0 else cv2.INTER_LINEAR
+        scaled = cv2.resize(frame, (sw, sh), interpolation=interp)
+        # centre inside the bounding rect, then clip to the canvas
+        ox = minx + (bw - sw) // 2
+        oy = miny + (bh - sh) // 2
+        x0, y0 = max(0, ox), max(0, oy)
+        x1, y1 = min(w, ox + sw), min(h, oy + sh)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return scaled[y0 - oy:y1 - oy, x0 - ox:x1 - ox], x0, y0
+
+    def composite(
+        self,
+        frame: np.ndarray,
+        canvas: np.ndarray,
+        live: bool = True,
+        quad: np.ndarray | None = None,
+        interpolation: int = cv2.INTER_LINEAR,
+    ) -> bool:
+        """Copy this projection into a BGRA canvas inside its quad; alpha = quad coverage.
+
+        live=True warps through the homography (with the given cv2 interpolation flag), otherwise
+        the frame is aspect-fit into the quad's bounding box. quad defaults to self.quad.
+        Returns False if nothing landed on the canvas.
+        """
+        quad = self.quad if quad is None else quad
+        h, w = canvas.shape[:2]
+        if live:
+            result = self.warp(frame, quad, w, h, interpolation)
+            if result is None:
+                return False
+            img, x0, y0 = result
+            mask, where = self._mask, self._mask_bool
+        else:
+            result = self._fit(frame, quad, w, h)
+            if result is None:
+                return False
+            img, x0, y0 = result
+            mask = self._quad_mask(quad, x0, y0, img.shape[1], img.shape[0])
+            where = mask.astype(bool)[..., None]
+        bh, bw = img.shape[:2]
+        roi = canvas[y0:y0 + bh, x0:x0 + bw]
+        np.copyto(roi[..., :3], img, where=where)
+        np.bitwise_or(roi[..., 3], mask, out=roi[..., 3])
+        return True
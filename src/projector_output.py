@@ -0,0 +1,101 @@
+"""Fullscreen projector output in its own SDL window (pip install pygame), outside Qt.
+
+The warp worker submits each finished composite; a pygame thread presents it with no Qt
+involvement, so the operator UI's event handling never delays the projector. SDL windows
+can't be driven from a background thread on macOS; there, Qt's fullscreen is used instead.
+"""
+import os
+import queue
+import sys
+import threading
+from typing import Callable
+
+import numpy as np
+
+try:
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    HAVE_PYGAME = sys.platform != "darwin" and not os.environ.get("PROJECTION_NO_PYGAME")
+except ImportError:
+    HAVE_PYGAME = False
+
+
+class ProjectorOutput:
+    """Latest-wins frame queue feeding a fullscreen pygame window on the projector display."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[np.ndarray]" = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self.on_closed: Callable[[], None] = None  # called on the pygame thread when Esc closes the window
+
+    @property
+    def running(self) -> bool:
+        """True while the window is up (False again once Esc closed it)."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="projector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def submit(self, bgra: np.ndarray):
+        """Hand over a BGRA composite (copied: the caller reuses its buffer). Any thread."""
+        if not self.running:
+            return
+        frame = bgra.copy()
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            # Drop the frame the window hasn't shown yet; only the newest matters
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(frame)
+
+    # --- PYGAME THREAD ---
+
+    def _run(self):
+        pygame.display.init()
+        try:
+            # Last display by default: the projector is usually the secondary monitor
+            display = int(os.environ.get("PROJECTION_DISPLAY", pygame.display.get_num_displays() - 1))
+            pygame.mouse.set_visible(False)
+            screen = None
+            shown: pygame.Surface = None
+            while not self._stop.is_set():
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        on_closed = self.on_closed
+                        if on_closed is not None:
+                            on_closed()
+                        return
+                    if event.type == pygame.WINDOWEXPOSED and shown is not None:
+                        screen.blit(shown, (0, 0))
+                        pygame.display.flip()
+                try:
+                    frame = self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                h, w = frame.shape[:2]
+                if screen is None or screen.get_size() != (w, h):
+                    # SCALED: SDL's renderer stretches the canvas-sized frame to the display
+                    screen = pygame.display.set_mode(
+                        (w, h), pygame.FULLSCREEN | pygame.SCALED | pygame.DOUBLEBUF, display=display
+                    )
+                # Alpha is 0 outside the quads; blitting over black keeps those pixels black
+                shown = pygame.image.frombuffer(frame, (w, h), "BGRA")
+                screen.fill((0, 0, 0))
+                screen.blit(shown, (0, 0))
+                pygame.display.flip()
+        finally:
+            pygame.display.quit()
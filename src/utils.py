@@ -1,45 +1,69 @@
+import json
 import os
 import sys
-import cv2
 import numpy as np
 
 from pathlib import Path
-from typing import List, Tuple
-from PySide6.QtCore import QPointF
+from typing import Tuple
 from PySide6.QtGui import QImage
 
+try:
+    import orjson  # optional: pip install orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
 
 
 
 
 def cv_to_qimage(frame_bgr: np.ndarray) -> QImage:
-    """Convert OpenCV BGR ndarray to QImage (RGB888)."""
+    """Wrap an OpenCV BGR/BGRA/grayscale ndarray as a QImage without copying or swapping channels.
+
+    The QImage shares the ndarray's memory; a reference is kept on it (qimg._buf) so the
+    array outlives the image.
+    """
     if frame_bgr is None:
         return QImage()
-    if len(frame_bgr.shape) == 2:
-        # Grayscale
-        h, w = frame_bgr.shape
-        qimg = QImage(frame_bgr.data, w, h, w, QImage.Format_Grayscale8)
-        return qimg.copy()
-    # Color
-    frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    h, w, ch = frame_rgb.shape
-    bytes_per_line = ch * w
-    qimg = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-    return qimg.copy()
-
-
-def order_quad_clockwise(points: List[QPointF]) -> List[QPointF]:
-    """Return points ordered clockwise starting from top-left approx."""
-    # Convert to array
-    arr = np.array([[p.x(), p.y()] for p in points], dtype=np.float32)
-    # Compute centroid
-    c = arr.mean(axis=0)
-    # Compute angles and sort clockwise (negative for Qt's y-down coords ok)
-    angles = np.arctan2(arr[:, 1] - c[1], arr[:, 0] - c[0])
-    order = np.argsort(angles)
-    ordered = arr[order]
+    if frame_bgr.ndim == 2:
+        fmt = QImage.Format_Grayscale8
+    elif frame_bgr.shape[2] == 4:
+        fmt = QImage.Format_ARGB32  # B,G,R,A bytes on little-endian hosts
+    else:
+        fmt = QImage.Format_BGR888
+    # QImage needs contiguous pixels within a row; only copy when the view isn't
+    if frame_bgr.strides[-1] != 1 or (frame_bgr.ndim == 3 and frame_bgr.strides[1] != frame_bgr.shape[2]):
+        frame_bgr = np.ascontiguousarray(frame_bgr)
+    h, w = frame_bgr.shape[:2]
+    qimg = QImage(frame_bgr.data, w, h, frame_bgr.strides[0], fmt)
+    qimg._buf = frame_bgr
+    return qimg
+
+
+def dumps_json(data) -> bytes:
+    """Serialize to 2-space indented JSON bytes (orjson when installed, else stdlib json)."""
+    if HAVE_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def loads_json(raw: bytes):
+    """Parse JSON bytes (orjson when installed, else stdlib json)."""
+    return orjson.loads(raw) if HAVE_ORJSON else json.loads(raw)
+
+
+def order_quad_clockwise(points) -> np.ndarray:
+    """Return a (4, 2) float32 array ordered clockwise starting from top-left approx.
+
+    Takes a (4, 2) array (or, at the UI edge, a sequence of QPointF).
+    """
+    if isinstance(points, np.ndarray):
+        arr = points.astype(np.float32, copy=False).reshape(-1, 2)
+    else:
+        arr = np.array([(p.x(), p.y()) for p in points], dtype=np.float32)
+    # Angles around the centroid (ascending atan2 is clockwise on screen: y points down)
+    d = arr - arr.mean(axis=0)
+    ordered = arr[np.argsort(np.arctan2(d[:, 1], d[:, 0]))]
     # Heuristic: ensure first is top-left by y then x
     idx_tl = np.argmin(ordered[:, 1] + ordered[:, 0] * 0.001)
-    ordered = np.roll(ordered, -idx_tl, axis=0)
-    return [QPointF(float(x), float(y)) for x, y in ordered]
+    return np.roll(ordered, -idx_tl, axis=0)
@@ -1,47 +1,354 @@
-from typing import Tuple
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
 
 import cv2
 import numpy as np
 
+try:
+    import av  # optional: pip install av
+    HAVE_AV = True
+except ImportError:
+    HAVE_AV = False
+
+log = logging.getLogger(__name__)
+
+# Codecs that, in a stream without a frame count, mean a still image rather than a clip
+_STILL_CODECS = {"mjpeg", "png", "bmp", "tiff", "webp", "gif", "jpeg2000", "jpegls"}
+
+# Loaded sources by absolute path, shared by every projection of the same file (get_or_create)
+_SOURCE_CACHE: Dict[str, "VideoSource"] = {}
+_CACHE_LOCK = threading.Lock()  # guards _SOURCE_CACHE and the sources' refcounts
+
+
+def _open_capture(path: str) -> cv2.VideoCapture:
+    """Open path with FFmpeg hardware decoding when this OpenCV build supports it.
+
+    Falls back to OpenCV's default backend (CPU decode) if the hw-accel open fails or the build
+    predates the acceleration API. Set PROJECTION_NO_HWACCEL=1 to skip the attempt.
+    """
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION") and not os.environ.get("PROJECTION_NO_HWACCEL"):
+        try:
+            cap = cv2.VideoCapture(
+                path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            )
+            if cap.isOpened():
+                return cap
+            cap.release()
+        except cv2.error as e:
+            log.warning("HW-accelerated open failed for %s: %s", path, e)
+    return cv2.VideoCapture(path)
+
+
+def _av_hwaccels() -> list:
+    """PyAV hardware decode settings to try, one per device type; empty for CPU decode only.
+
+    hwdevices_available() lists the device types FFmpeg was built with, not the devices this
+    machine has, so callers try each in turn until one opens.
+    """
+    if os.environ.get("PROJECTION_NO_HWACCEL"):
+        return []
+    try:
+        from av.codec.hwaccel import HWAccel, hwdevices_available
+    except ImportError:  # PyAV < 14
+        return []
+    return [HWAccel(device_type=d, allow_software_fallback=True) for d in hwdevices_available()]
+
+
+def _imread(path: str) -> np.ndarray | None:
+    """cv2.imread through a read-only mmap + imdecode: the file bytes are never copied."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buf = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+            finally:
+                del buf  # the mmap can't close while a view is exported
+    except (OSError, ValueError):  # missing or empty file
+        return None
+
+
+def corner_points(w: int, h: int) -> np.ndarray:
+    """Pixel-centre corners of a w x h source, clockwise from top-left."""
+    return np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+
+
 class VideoSource:
-    """Handles image or video using OpenCV. Unifies get_frame()."""
+    """Handles image or video. Unifies get_frame().
+
+    Videos decode through PyAV when it is installed, otherwise through OpenCV. Either way they
+    are decoded on a daemon thread, paced to the file's frame rate, and published latest-wins:
+    frames the consumer didn't pick up in time are simply replaced. get_frame() never blocks.
+
+    Projections share one source per file through get_or_create(), so a clip shown on several
+    quads is decoded once; each reference is given back with close().
+    """
 
     def __init__(self):
-        self.cap = None
+        self.cap = None  # OpenCV backend
+        self.container = None  # PyAV backend
+        self.stream = None
+        self._iter = None  # PyAV frame iterator over self.stream
+        self._pending = None  # PyAV frame already decoded by an exact seek
         self.single_frame = None
         self.path = None
+        self.seq_no = 0  # bumps on every newly decoded frame
+        self._lock = threading.Lock()  # serializes decoder access between the decode thread, seek() and close()
+
+        # Decode-ahead state (video only)
+        self._frame_cond = threading.Condition()  # guards _latest; notified on every new frame
+        self._latest: Tuple[np.ndarray, int] = (None, 0)  # newest decoded (frame, seq_no)
+        self.on_frame: Callable[[], None] = None  # called on the decoder thread after each new frame
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self._size: Tuple[int, int] = None
+        self.src_pts: np.ndarray = None  # corner_points() of the source size, set by load()
+        self._out_size: Tuple[int, int] = None  # decoder resizes frames to this (None = native)
+        self._out_sizes: Dict[object, Tuple[int, int] | None] = {}  # owner -> requested size
+        self._out_lock = threading.Lock()  # guards _out_sizes
+
+        # Sharing (get_or_create)
+        self._key: str = None  # _SOURCE_CACHE key, None if not shared
+        self._refs = 0
+        self._load_lock = threading.Lock()  # held by the caller that loads a shared source
+        self._loaded = False
+        self._frame_time = 1.0 / 30
+
+    @property
+    def is_video(self) -> bool:
+        return self.cap is not None or self.container is not None
 
     def load(self, path: str):
         self.path = path
         # Try video first
-        cap = cv2.VideoCapture(path)
-        if cap.isOpened() and int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) > 1:
-            self.cap = cap
+        if (HAVE_AV and self._open_av(path)) or self._open_cv(path):
             self.single_frame = None
+            # First frame synchronously so there is something to show right away
+            ok, frame = self._read()
+            self.seq_no += 1
+            self._latest = (frame if ok else None, self.seq_no)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._decode_loop, name=f"decode:{path}", daemon=True)
+            self._thread.start()
+            self.src_pts = corner_points(*self.get_source_size())
+            self._loaded = True
             return
         # Fallback image
-        cap.release()
-        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        img = _imread(path)
         if img is None:
             raise ValueError("Failed to load media. Unsupported or missing file.")
         self.single_frame = img
         self.cap = None
+        self.seq_no += 1
+        self.src_pts = corner_points(*self.get_source_size())
+        self._loaded = True
+
+    @classmethod
+    def get_or_create(cls, path: str) -> "VideoSource":
+        """Loaded source for path, shared with everyone else showing the same file.
+
+        Each call takes a reference that close() gives back; the last close() stops the decoder.
+        Raises like load() if the file can't be opened.
+        """
+        key = os.path.abspath(path)
+        with _CACHE_LOCK:
+            src = _SOURCE_CACHE.get(key)
+            if src is None:
+                src = _SOURCE_CACHE[key] = cls()
+                src._key = key
+            src._refs += 1
+        # The first caller loads; concurrent callers for the same file wait for it
+        with src._load_lock:
+            if not src._loaded:
+                try:
+                    src.load(path)
+                except Exception:
+                    src.close()
+                    raise
+        return src
+
+    def _open_av(self, path: str) -> bool:
+        container = None
+        for hwaccel in _av_hwaccels():
+            try:
+                container = av.open(path, hwaccel=hwaccel)
+                break
+            except FileNotFoundError:
+                return False
+            except (TypeError, av.error.FFmpegError):
+                continue  # older PyAV, or no such device on this machine
+        if container is None:
+            try:
+                container = av.open(path)
+            except av.error.FFmpegError:
+                return False
+        stream = container.streams.video[0] if container.streams.video else None
+        fmt = container.format.name
+        # Stills are left to the image path: image demuxers (image2, png_pipe, ...), single-frame
+        # streams, and frame-count-less streams that have no duration or use an image codec
+        still = (
+            stream is None
+            or fmt == "image2"
+            or fmt.endswith("_pipe")
+            or stream.frames == 1
+            or (stream.frames == 0 and (not stream.duration or stream.codec_context.name in _STILL_CODECS))
+        )
+        if still:
+            container.close()
+            return False
+        stream.thread_type = "AUTO"
+        self.container, self.stream = container, stream
+        self._iter = container.decode(stream)
+        self._size = (stream.width, stream.height)
+        fps = float(stream.average_rate or 0)
+        self._frame_time = 1.0 / fps if 0 < fps <= 240 else 1.0 / 30
+        return True
 
-    def get_frame(self) -> np.ndarray:
-        if self.cap is not None:
+    def _open_cv(self, path: str) -> bool:
+        cap = _open_capture(path)
+        if not (cap.isOpened() and int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) > 1):
+            cap.release()
+            return False
+        self.cap = cap
+        self._size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self._frame_time = 1.0 / fps if 0 < fps <= 240 else 1.0 / 30
+        return True
+
+    def _read(self) -> Tuple[bool, np.ndarray]:
+        """Decode the next BGR frame, looping at the end. Caller holds _lock."""
+        if self.container is not None:
+            try:
+                frame = self._pending
+                self._pending = None
+                if frame is None:
+                    try:
+                        frame = next(self._iter)
+                    except (StopIteration, av.error.EOFError):
+                        # loop
+                        self.container.seek(0)
+                        self._iter = self.container.decode(self.stream)
+                        frame = next(self._iter)
+                out = self._out_size
+                if out is None:
+                    return True, frame.to_ndarray(format="bgr24")
+                # swscale does the resize in the same pass as the colour conversion
+                return True, frame.to_ndarray(width=out[0], height=out[1], format="bgr24", interpolation="AREA")
+            except (StopIteration, av.error.FFmpegError) as e:
+                # Debug only: this runs on every decoder tick while the file keeps failing
+                log.debug("Decode failed for %s: %s", self.path, e)
+                return False, None
+        ok, frame = self.cap.read()
+        if not ok:
+            # loop
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             ok, frame = self.cap.read()
-            if not ok:
-                # loop
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ok, frame = self.cap.read()
-            return frame
-        return self.single_frame
+        out = self._out_size
+        if ok and out is not None:
+            frame = cv2.resize(frame, out, interpolation=cv2.INTER_AREA)
+        return ok, frame
+
+    def set_output_size(self, size: Tuple[int, int] | None, owner=None):
+        """Have the decoder shrink frames to size (w, h) from its next frame on; None = native.
+
+        A shared source decodes at the largest size any of its owners asked for.
+        """
+        with self._out_lock:
+            self._out_sizes[owner] = size
+            self._update_out_size()
+
+    def _update_out_size(self):
+        sizes = list(self._out_sizes.values())
+        if not sizes or None in sizes:
+            self._out_size = None
+        else:
+            self._out_size = max(sizes)
+
+    def seek(self, idx: int, exact: bool = False):
+        """Jump playback to frame idx.
+
+        exact=False lands on the keyframe at or before idx (cheap); exact=True decodes forward
+        from there so the next frame shown is idx itself. OpenCV's backend is always exact.
+        """
+        with self._lock:
+            if self.container is not None:
+                s = self.stream
+                target = int(idx / ((s.average_rate or 30) * s.time_base)) + (s.start_time or 0)
+                self.container.seek(target, stream=s, backward=True, any_frame=False)
+                self._iter = self.container.decode(s)
+                self._pending = None
+                if exact:
+                    for frame in self._iter:
+                        if frame.pts is None or frame.pts >= target:
+                            self._pending = frame
+                            break
+            elif self.cap is not None:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+
+    # --- DECODER THREAD ---
+
+    def _decode_loop(self):
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                if not self.is_video:
+                    return
+                ok, frame = self._read()
+            if ok:
+                with self._frame_cond:
+                    self.seq_no += 1
+                    self._latest = (frame, self.seq_no)  # latest wins; an unread frame is dropped
+                    self._frame_cond.notify_all()
+                on_frame = self.on_frame
+                if on_frame is not None:
+                    on_frame()
+            # Pace to the video's frame rate; resync instead of bursting after a stall
+            deadline += self._frame_time
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                deadline = time.monotonic()
+
+    # --- CONSUMER ---
+
+    def get_frame(self) -> Tuple[np.ndarray, int]:
+        """Return (frame, seq_no) without blocking. seq_no only moves when a new frame was decoded."""
+        if self.single_frame is not None:
+            return self.single_frame, self.seq_no
+        with self._frame_cond:
+            return self._latest
+
+    def close(self, owner=None):
+        """Give back a reference (and owner's output size); the last one stops the decoder and
+        releases the capture / container."""
+        with self._out_lock:
+            self._out_sizes.pop(owner, None)
+            self._update_out_size()
+        with _CACHE_LOCK:
+            self._refs = max(0, self._refs - 1)
+            if self._refs > 0:
+                return
+            if self._key is not None and _SOURCE_CACHE.get(self._key) is self:
+                del _SOURCE_CACHE[self._key]
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        with self._lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+            if self.container is not None:
+                self.container.close()
+                self.container = self.stream = self._iter = self._pending = None
 
     def get_source_size(self) -> Tuple[int, int]:
-        if self.cap is not None:
-            w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            return w, h
+        if self._size is not None:
+            return self._size
         if self.single_frame is not None:
             h, w, _ = self.single_frame.shape
             return w, h
@@ -0,0 +1,209 @@
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QObject, QMutex, QMutexLocker, Qt, QTimer, Signal, Slot
+from PySide6.QtGui import QImage
+
+from projections import Projection
+
+
+class WarpWorker(QObject):
+    """Warps and composites all projections off the GUI thread into a double-buffered BGRA canvas.
+
+    Canvas publishes a snapshot of the scene with set_scene(); the worker renders when the scene
+    changes or a video decoder publishes a new frame, and hands finished frames back through
+    frameReady. A buffer is only reused after the GUI has acknowledged the frame that replaced
+    it, so a frame on screen is never written to.
+    """
+
+    FALLBACK_MS = 100  # safety-net poll, only while a video is in the scene
+
+    frameReady = Signal(QImage)
+    sourcesReady = Signal(object)  # GPU mode: [(projection, quad, frame, seq_no)], warped by the GL canvas
+    wake = Signal()  # emitted from any thread; runs tick() on the worker thread
+    acked = Signal()  # emitted by ack() on the GUI thread; runs _on_ack() on the worker thread
+
+    def __init__(self):
+        super().__init__()
+        self._lock = QMutex()  # guards the scene snapshot below
+        self._scene: List[Tuple[Projection, np.ndarray]] = []  # (projection, quad copy)
+        self._live = True
+        self._dragged: Projection = None  # projection whose quad is being dragged, if any
+        self._gpu = False
+        self._size: Tuple[int, int] = (0, 0)
+        self._version = 0
+        self._output = None  # ProjectorOutput that also receives each CPU composite
+
+        # Worker-thread state
+        self._rendered_version = -1
+        self._visible: List[Tuple[Projection, np.ndarray]] = []  # scene minus culled projections
+        self._culled_version = -1
+        self._frames: Dict[Projection, Tuple[np.ndarray, int]] = {}  # proj -> (frame, seq_no)
+        self._buffers: List[np.ndarray] = [None, None]
+        self._back = 0
+        self._in_flight = False
+        self._missed = False  # a tick was skipped while a frame was in flight
+        self._tick_queued = False
+        self._timer: QTimer = None
+        self.wake.connect(self.tick, Qt.QueuedConnection)
+        self.acked.connect(self._on_ack, Qt.QueuedConnection)
+
+    # --- GUI THREAD ---
+
+    def set_scene(
+        self,
+        projections: List[Projection],
+        live: bool,
+        w: int,
+        h: int,
+        dragged: Projection = None,
+        gpu: bool = False,
+    ):
+        """Publish what to render: quads are copied so later edits can't tear a frame.
+
+        dragged is the projection under the mouse; only it is previewed with nearest-neighbour.
+
+        gpu=True skips the CPU warp; the visible sources are handed to the GL canvas instead.
+        """
+        snapshot = [(p, p.quad.copy()) for p in projections]
+        with QMutexLocker(self._lock):
+            self._scene = snapshot
+            self._live = live
+            self._dragged = dragged
+            self._gpu = gpu
+            self._size = (w, h)
+            self._version += 1
+        for p in projections:
+            p.media.on_frame = self.request_tick
+        self.request_tick()
+
+    def set_output(self, output):
+        """Also send every CPU composite to output.submit() (None to stop)."""
+        with QMutexLocker(self._lock):
+            self._output = output
+        self.request_tick()
+
+    def ack(self):
+        """The GUI has taken the last frame; the buffer it replaced may be reused."""
+        # _in_flight/_missed are only touched on the worker thread, so a tick can't miss this
+        self.acked.emit()
+
+    # --- ANY THREAD ---
+
+    def request_tick(self):
+        """Schedule one tick() on the worker thread; bursts of requests collapse into one."""
+        if not self._tick_queued:
+            self._tick_queued = True
+            self.wake.emit()
+
+    # --- WORKER THREAD ---
+
+    @Slot()
+    def start(self):
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FALLBACK_MS)
+        self._timer.timeout.connect(self.tick)
+        self.tick()
+
+    @Slot()
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    @Slot()
+    def _on_ack(self):
+        self._in_flight = False
+        if self._missed:
+            self._missed = False
+            self.tick()
+
+    def _buffer(self, w: int, h: int) -> np.ndarray:
+        buf = self._buffers[self._back]
+        if buf is None or buf.shape[:2] != (h, w):
+            buf = self._buffers[self._back] = np.empty((h, w, 4), dtype=np.uint8)
+        return buf
+
+    @staticmethod
+    def _cull(scene: List[Tuple[Projection, np.ndarray]], live: bool, w: int, h: int):
+        """Drop projections that can't contribute a pixel: off-canvas, or (live) fully covered.
+
+        Walks the scene top to bottom; a live quad's fill is opaque, so a projection whose mask
+        lies entirely inside the union of the quads drawn after it is skipped. Non-live previews
+        only fill part of their quad, so they never occlude anything.
+        """
+        visible = []
+        cover = np.zeros((h, w), dtype=np.uint8) if live and len(scene) > 1 else None
+        for proj, quad in reversed(scene):
+            x0, y0, x1, y1 = Projection._quad_roi(quad, w, h)
+            if x0 >= x1 or y0 >= y1:
+                continue  # entirely off-canvas
+            if cover is not None:
+                mask = Projection._quad_mask(quad, x0, y0, x1 - x0, y1 - y0)
+                roi = cover[y0:y1, x0:x1]
+                if cv2.countNonZero(cv2.subtract(mask, roi)) == 0:
+                    continue  # every pixel is overdrawn by a later quad
+                np.bitwise_or(roi, mask, out=roi)
+            visible.append((proj, quad))
+        visible.reverse()
+        return visible
+
+    @Slot()
+    def tick(self):
+        """Pull frames; re-render only if a video advanced or the scene changed."""
+        self._tick_queued = False
+        if self._in_flight:
+            self._missed = True
+            return
+        with QMutexLocker(self._lock):
+            scene, live, (w, h), version = self._scene, self._live, self._size, self._version
+            dragged, gpu, output = self._dragged, self._gpu, self._output
+        if self._timer is not None:
+            has_video = any(p.media.is_video for p, _ in scene)
+            if has_video != self._timer.isActive():
+                self._timer.start() if has_video else self._timer.stop()
+        if version != self._culled_version and w > 0 and h > 0:
+            self._visible = self._cull(scene, live, w, h)
+            self._culled_version = version
+        scene = self._visible
+
+        advanced = False
+        frames = {}
+        for proj, _ in scene:
+            frame, seq_no = proj.media.get_frame()
+            last = self._frames.get(proj)
+            if last is None or last[1] != seq_no:
+                advanced = True
+            frames[proj] = (frame, seq_no)
+        self._frames = frames  # also forgets projections that left the scene
+        if not (advanced or version != self._rendered_version) or w <= 0 or h <= 0:
+            return
+
+        if gpu:
+            # The shader samples whatever is uploaded, so size sources for their quads here
+            items = []
+            for proj, quad in scene:
+                frame, seq_no = frames[proj]
+                if frame is not None:
+                    items.append((proj, quad, proj.source_for(frame, quad), seq_no))
+            self._rendered_version = version
+            self._in_flight = True
+            self.sourcesReady.emit(items)
+            return
+
+        buf = self._buffer(w, h)
+        buf.fill(0)
+        for proj, quad in scene:
+            frame = frames[proj][0]
+            if frame is not None:
+                # The dragged image is in motion: nearest-neighbour is ~2x cheaper and looks the
+                # same. Everything else keeps bilinear so it doesn't shift when a drag starts.
+                interpolation = cv2.INTER_NEAREST if proj is dragged else cv2.INTER_LINEAR
+                proj.composite(frame, buf, live=live, quad=quad, interpolation=interpolation)
+        self._rendered_version = version
+        if output is not None:
+            output.submit(buf)
+
+        self._in_flight = True
+        self._back ^= 1
+        self.frameReady.emit(QImage(buf.data, w, h, buf.strides[0], QImage.Format_ARGB32_Premultiplied))